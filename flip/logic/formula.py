@@ -5,19 +5,69 @@ substitution.  The matching methods also check side conditions
 involving bound and free variables.
 """
 
-from operator import concat      # for free method in Compound
-from copy import copy, deepcopy  # for subst methods
-from functools import reduce
-
-class Symbol(object):
+from weakref import WeakValueDictionary # for hash-consing
+
+# Hash-consing: formulas are immutable once constructed, so structurally
+# equal formulas can be shared.  Constructors return the existing instance
+# if there is one, so equal subformulas are usually identical (is).
+# Weak values, so formulas no longer used elsewhere are not kept here.
+_intern = WeakValueDictionary() # structural hash _hash : formula instance
+
+def intern(formula):
+  'Return interned formula structurally equal to formula, formula if new'
+  shared = _intern.get(formula._hash)
+  if shared is None:
+    _intern[formula._hash] = formula
+  elif type(shared) is type(formula) and shared._same(formula):
+    return shared
+  return formula # new formula, or hash collision: don't share
+
+class Interned(type):
+  """
+  Metaclass for Symbol and Compound, constructors return interned instance
+  """
+  def __call__(cls, *args, **kwargs):
+    if not cls._interned:
+      return type.__call__(cls, *args, **kwargs)
+    if not kwargs: # _args_hash needs positional args, Letter(name='k') is ok
+      shared = _intern.get(cls._args_hash(args))
+      if shared is not None and type(shared) is cls and shared._checked \
+          and shared._same_args(args):
+        return shared # skip __init__, args were checked when shared was made
+    formula = intern(type.__call__(cls, *args, **kwargs)) # __init__ checks args
+    formula._checked = True # might be shared instance made by subst, unchecked
+    return formula
+
+def cached(method):
+  """
+  Decorator for pform and ppf methods in Compound and its subclasses.
+  Formulas are immutable, so build the string once and save it in the
+  instance, _rehash clears it.
+  """
+  attr = '_' + method.__name__  # _pform or _ppf
+  def cached_method(self):
+    string = getattr(self, attr, None)
+    if string is None:
+      string = method(self)
+      setattr(self, attr, string)
+    return string
+  cached_method.__doc__ = method.__doc__
+  return cached_method
+
+class Symbol(object, metaclass=Interned):
   """
   Base class for syntax elements without arguments:
   T, F, propositional letters, variables, and match placeholders.
   """
   # Each Symbol instance has its own name, printed by both ppf and pform.
   # Kaye uses a single letter for the name, but any Python identifier will work
+  _interned = True # see Interned metaclass, above
+  _checked = False # True after __init__ checks args, see Interned
+  _tag = 0 # 0 except in Let, faster than isinstance, see Compound.mismatch
+
   def __init__(self, name):
     self.name = name
+    self._hash = self._args_hash((name,)) # for fast equal, see below
 
   def pform(self):
     return self.name
@@ -26,22 +76,39 @@ class Symbol(object):
     return self.pform()
   
   def mismatch(self, formula, subformulas, bound,free, other_errors,rule_type):
-    if not isinstance(formula, type(self)): # pattern can be superclass
-      return [ (self, formula, copy(bound)) ]  # formula is not a Symbol
+    if self is formula: # interned, so usually equal symbols are identical
+      return []
+    elif not isinstance(formula, type(self)): # pattern can be superclass
+      return [ (self, formula, bound) ]  # formula is not a Symbol
     elif self.name != formula.name:
-      return [ (self, formula, copy(bound)) ]  # different symbol
+      return [ (self, formula, bound) ]  # different symbol
     else:
       return [] # symbols match
 
   def equal(self, other):
     'Structural equality,== tests instance identity. Dont redefine __eq__ now'
+    if self is other:
+      return True
     return type(self) == type(other) and self.name == other.name
     
+  @classmethod
+  def _args_hash(cls, args):
+    'Structural hash of symbol constructed by cls(*args), used by Interned'
+    return hash((cls.__name__,) + tuple(args))
+
+  def _same_args(self, args):
+    'True if self is the symbol constructed by type(self)(*args)'
+    return len(args) == 1 and self.name == args[0]
+
+  def _same(self, other):
+    'Same structure, other has same type as self, used by intern'
+    return self._same_args((other.name,))
+
   def subst(self, substitutions):
     for key, value in substitutions.items():
       if self.equal(key):
-        return deepcopy(value) #substitutions is dict,only one match possible
-    return deepcopy(self)  # no match
+        return value #substitutions is dict,only one match possible
+    return self  # no match, formulas are immutable so no need to copy
 
   def generate(self, subformulas, otherdata, other_errors):
     'return formula generated by substituting subformulas into pattern (self)'
@@ -53,7 +120,7 @@ class Formula(object):
   Top-level expression in a proof step must be a Formula
   Arguments to logical operators must be Formulas
   """
-  pass
+  _tag = 0 # see Symbol._tag, for formulas like Text that are not Symbols
 
 class Term(object):
   """
@@ -85,15 +152,48 @@ class Variable(Symbol, Term):
   def free(self):
     return [ self ]
 
-class Compound(object):
+class Compound(object, metaclass=Interned):
   """
   Base class for syntax elements with one or more arguments:
   Functions, relations, formulas, logical operators, quantifiers, ...
   """
+  _interned = True # see Interned metaclass, above
+  _checked = False # True after __init__ checks args, see Interned
+  _tag = 0 # see Symbol._tag
+
   def __init__(self, *args): 
-    self.args = list(args)   # mutable but update only in copied instance
+    self.args = list(args)   # do not update, instance may be shared
+    self._rehash()
+
+  def _rehash(self):
+    'Cache structural hash, must call again after any update to self.args'
+    # equal formulas have equal hashes, so unequal hashes short-circuit equal
+    self._free_cache = None # computed by free method on first call
+    self._pform = self._ppf = None # computed by cached methods on first call
+    self._hash = self._args_hash(self.args)
+
+  @classmethod
+  def _args_hash(cls, args):
+    'Structural hash of formula constructed by cls(*args), used by Interned'
+    return hash((cls.__name__,
+                 tuple(getattr(a, '_hash', id(a)) for a in args)))
+
+  def _same_args(self, args):
+    'True if self is the formula constructed by type(self)(*args)'
+    # args are interned, so equal args are identical
+    return len(self.args) == len(args) and \
+      all(a is b for a, b in zip(self.args, args))
+
+  def _same(self, other):
+    'Same structure, other has same type as self, used by intern'
+    return self._same_args(other.args)
+
+  def _rebind(self):
+    'Update attributes that alias args, subclasses override'
+    pass
 
   # pform prints class name.  same pform is used by all subclasses
+  @cached
   def pform(self):
     name = self.__class__.__name__
     arglist = ','.join([ a.pform() for a in self.args ])
@@ -104,44 +204,112 @@ class Compound(object):
     return self.pform()
 
   def free(self):
-    freevs = reduce(concat, map(lambda a: a.free(), self.args))
-    return remove_dups(freevs)
+    # Post-order walk with explicit stack, not recursion, like subst.
+    # Formula is immutable, so cache free variables on each subformula.
+    if self._free_cache is None:
+      stack = [ (self, False) ] # (subformula, are its args done?)
+      while stack:
+        form, args_done = stack.pop()
+        if args_done:
+          form._free_cache = form._free_args([ a._free_cache if walk_free(a)
+                                               else a.free() # symbol etc.
+                                               for a in form.args ])
+        elif form._free_cache is None:
+          stack.append((form, True))
+          stack.extend((a, False) for a in form.args if walk_free(a))
+    return list(self._free_cache) # caller might update list, so copy
+
+  def _free_args(self, args_free):
+    'Free variables from free variables of each arg, subclasses override'
+    seen = {} # ordered, remove duplicates in one pass
+    for vs in args_free:
+      for v in vs:
+        seen.setdefault(id(v), v) # variables are interned, compare id
+    return tuple(seen.values())
 
   def mismatch(self, formula, subformulas, bound,free, other_errors,rule_type):
-    if isinstance(formula, Let) and not isinstance(self, Let):
+    if formula._tag and not self._tag: # Let, see Symbol._tag
       return Compound.mismatch(self, formula.formula, subformulas, bound, 
                              free, other_errors, rule_type)
+    elif self is formula: # interned, so usually equal formulas are identical
+      return [] # no need to recurse, formula matches itself
     elif not isinstance(formula, type(self)): # pattern can be superclass
-      return [(self, formula, copy(bound))] # wrong formula class, outermost op
+      return [(self, formula, bound)] # wrong formula class, outermost op
+    elif len(self.args) != len(formula.args): # relations have any arity
+      return [(self, formula, bound)] # wrong number of args, zip won't tell
     else:
-      mismatches = []
-      for i in range(len(formula.args)):
-        mm = self.args[i].mismatch(formula.args[i], subformulas, 
-                                            bound,free, other_errors,rule_type)
+      mismatches = [] # bound is passed down unchanged, only Quantifier extends
+      for s_arg, f_arg in zip(self.args, formula.args):
+        mm = s_arg.mismatch(f_arg, subformulas, 
+                            bound, free, other_errors, rule_type)
         if other_errors:
           return False 
         else:
-          mismatches += mm
+          mismatches.extend(mm)
       return mismatches
 
   def equal(self, other):
     'Structural equality,== tests instance identity. Dont redefine __eq__ now'
-    if type(self) != type(other):
-      return False
-    for i, arg in enumerate(self.args):
-      if not arg.equal(other.args[i]):
+    pairs = [ (self, other) ] # explicit stack, not recursion
+    while pairs:
+      s, o = pairs.pop()
+      if s is o:
+        continue
+      if type(s) != type(o):
+        return False
+      if not isinstance(s, Compound): # Symbol
+        if not s.equal(o):
+          return False
+        continue
+      if s._hash != o._hash or len(s.args) != len(o.args): # see _rehash
         return False
+      pairs.extend(reversed(list(zip(s.args, o.args)))) # leftmost first
     return True
 
   def subst(self, substitutions):
+    # Post-order walk with explicit stack, not recursion.
+    # Substituted formula for each subformula, shared subformulas done once
+    done = {} # id(subformula) : substituted subformula
+    # Look up each subformula by hash, don't compare it to every key
+    index = {} # structural hash _hash : [ (key, value), ... ] equal hashes
     for key, value in substitutions.items():
-      if self.equal(key):
-        return deepcopy(value) # replace whole formula
-    formcopy = deepcopy(self)  # must have deepcopy not copy here
-    for i, form in enumerate(self.args):
-      # substituting into copy achieves simultaneous not sequential subst.
-      formcopy.args[i] = form.subst(substitutions)
-    return formcopy # deep copy of self if no substitutions
+      index.setdefault(key._hash, []).append((key, value))
+    stack = [ (self, False) ] # (subformula, are its args done?)
+    while stack:
+      form, args_done = stack.pop()
+      if args_done:
+        # substituting into original args achieves simultaneous not sequential
+        done[id(form)] = form._rebuild([ done[id(a)] for a in form.args ])
+        continue
+      if id(form) in done:
+        continue
+      # equal formulas have equal hashes, so key must be in this list
+      for key, value in index.get(getattr(form, '_hash', None), ()):
+        if form.equal(key):
+          done[id(form)] = value # replace whole subformula
+          break
+      else:
+        subst_method = type(form).subst
+        if subst_method is Compound.subst:
+          stack.append((form, True))
+          stack.extend((a, False) for a in form.args)
+        elif subst_method is Symbol.subst:
+          done[id(form)] = form # no match, Symbol.subst would just search again
+        else:
+          done[id(form)] = form.subst(substitutions) # subclass overrides subst
+    return done[id(self)]
+
+  def _rebuild(self, args):
+    'Return interned formula like self but with args, self if args unchanged'
+    if all(a is b for a, b in zip(args, self.args)):
+      return self # no substitutions, share self
+    formcopy = self.__class__.__new__(self.__class__) # skip __init__ checks
+    formcopy.__dict__.update(self.__dict__) # symbol etc. from subclass __init__
+    formcopy._checked = False # subst might put term where variable required
+    formcopy.args = args
+    formcopy._rebind()
+    formcopy._rehash()
+    return intern(formcopy)
 
   def generate(self, subformulas, otherdata, other_errors):
     'return formula generated by substituting subformulas into pattern (self)'
@@ -172,6 +340,7 @@ class Prefix(Compound):
     Compound.__init__(self, *args)
     self.symbol = '?'          # each subclass will rebind
 
+  @cached
   def ppf(self):
     fmt = '%s%s'      # no parens
     if isinstance(self.args[0], Infix): # ... and higher arities
@@ -187,6 +356,7 @@ class Infix(Compound):
     Compound.__init__(self, *args)
     self.symbol = '?'  # each subclass will rebind
 
+  @cached
   def ppf(self):
     f = [ '%s', '%s' ]  # format strings, no parens
     for i, a in enumerate(self.args):
@@ -237,29 +407,30 @@ class Quantifier(Compound, Formula):
     self.bound = self.args[0]     # variable
     self.formula = self.args[1]   # formula
 
+  @cached
   def pform(self):
     return '%s(%s, %s)' % \
       (self.__class__.__name__,self.bound.name,self.formula.pform())
 
+  @cached
   def ppf(self):
     fmt = '%s%s.%s'     # no parens around formula
     if isinstance(self.formula, Infix):
       fmt = '%s%s.(%s)'  # parens
     return fmt % (self.__class__.__name__, self.bound.name, self.formula.ppf())
 
-  def free(self):
-    return [ v for v in self.formula.free() if not v == self.bound ]
+  def _free_args(self, args_free): # see Compound.free
+    return tuple(v for v in args_free[1] if not v == self.bound) # formula
                   
   def mismatch(self, formula, subformulas, bound,free, other_errors,rule_type):
-    bound.append(self.bound)
+    # caller might pass a list, convert it here where bound is extended
+    bound = (self.bound, list_to_bound(bound)) # see bound_to_list
     return Compound.mismatch(self, formula, subformulas, bound, free, 
                              other_errors, rule_type)
    
-  def subst(self, substitutions):
-    qformcopy = Compound.subst(self, substitutions) # rebinds args only
-    qformcopy.bound = qformcopy.args[0]   # variable
-    qformcopy.formula = qformcopy.args[1] # formula    
-    return qformcopy
+  def _rebind(self): # called by Compound._rebuild after it rebinds args
+    self.bound = self.args[0]   # variable
+    self.formula = self.args[1] # formula    
 
   def generate(self, subformulas, otherdata, other_errors):
     if self.bound in subformulas:
@@ -267,13 +438,12 @@ class Quantifier(Compound, Formula):
       bound = subformulas[self.bound]  
     else:
       # Ei, otherdata is a tuple, otherdata[0] is the dictionary {t1:v1}
-      if len(otherdata) < 1 or not isinstance(otherdata[0], dict):
+      datum = otherdata[0] if otherdata else None
+      if not isinstance(datum, dict):
         other_errors.append(
           'Fail: apply command requires argument: {term:variable}')
         return False
-      pair = list((otherdata[0].items()))[0]
-      term = pair[0]
-      bound = pair[1]
+      term, bound = next(iter(datum.items())) # first pair, no list needed
       if not (isinstance(bound,Variable) and isinstance(term,Term)):
         other_errors.append(
           'Fail: apply command requires argument: {term:variable}')
@@ -300,17 +470,20 @@ class New(Relation):
     check_count(self, 1, *args)
     check_type(self, Variable, *args)
     Relation.__init__(self, *args)
-    self.variable = self.args[0]
 
+  variable = property(lambda self: self.args[0]) # never stale after subst
+
+  @cached
   def pform(self):
     return 'New(%s)' % self.variable.pform()
 
+  @cached
   def ppf(self):
     return 'Let %s be arbitrary' % self.variable.ppf()
 
-  def free(self):
-    return self.variable.free()  
-    
+  def _free_args(self, args_free): # see Compound.free
+    return tuple(args_free[0]) # variable
+
   def mismatch(self, formula, subformulas, bound,free, other_errors,rule_type):
     if rule_type == ar: # assume step, check that variable is new
       if formula.variable in free:
@@ -331,20 +504,21 @@ class Let(Quantifier):
   Let(x,P(x)) mismatch method returns other_error if x is already free in proof
   Subclass of Quantifier because it has same syntax and arg checks as any Q.
   """
-  def __init__(self, *args):
-    Quantifier.__init__(self, *args)
-    # self.formula = self.args[1] # already assigned in Quantifier.__init__
-    self.variable = self.args[0]  # already assigned to self.bound in Quant.
+  _tag = 1 # see Symbol._tag
 
+  variable = property(lambda self: self.args[0]) # same as self.bound
+
+  @cached
   def pform(self):
     return 'Let(%s,%s)' % (self.variable.pform(), self.formula.pform())
 
+  @cached
   def ppf(self):
     return 'Let %s satisfy %s' % (self.variable.ppf(), self.formula.ppf())
 
-  def free(self):
-    return self.formula.free()  
-    
+  def _free_args(self, args_free): # see Compound.free
+    return tuple(args_free[1]) # formula, variable is not bound here
+
   def mismatch(self, formula, subformulas, bound,free, other_errors,rule_type):
     # mismatch checks variable only in assume step where it is introduced
     if rule_type == ar: # assume step, check that variable is new
@@ -413,8 +587,12 @@ class Subst(Symbol, Formula):
   # In S1(t1), does *not* check that t1 occurs in S1
   # Subst is a placeholder but doesn't inherit anything from Placeholder class
   # Don't use Symbol.__init__ here
+  # Don't intern: same name, different substitutions, _same can't tell them
+  _interned = False
+
   def __init__(self, arg):
     self.name = self.pattern.name  # subclass assigns self.pattern
+    self._hash = hash((type(self).__name__, self.name)) # as in Symbol.__init__
     if isinstance(arg, dict):
       self.substitutions = arg.items() # convert dictionary to list of pairs
     elif isinstance(arg, Symbol):
@@ -424,18 +602,35 @@ class Subst(Symbol, Formula):
     # If the argument is not a dictionary it is simply ignored!
     # The rule looks nice with P1(v1) but this code doesn't use v1 at all.
 
-  def mismatch(self, formula, subformulas, bound,free, other_errors,rule_type):
-    if self.pattern not in subformulas:
+  def _premise(self, formula, subformulas):
+    """
+    Beginning of mismatch in Subst and all its subclasses.
+    Return subformula bound to placeholder self.pattern, from the premise.
+    If self.pattern is not bound yet, bind it to formula and return None.
+    """
+    premise = subformulas.get(self.pattern)
+    if premise is None:
       subformulas.update({ self.pattern : formula })
+    return premise
+
+  def mismatch(self, formula, subformulas, bound,free, other_errors,rule_type):
+    premise = self._premise(formula, subformulas)
+    if premise is None:
       return [] # formula matches this Placeholder 
     else: 
     # self.pattern is premise P1. formula is conclusion, P1 with substitutions
     # First of each mismatches tuple is source subformula from P1 in premise
     # Second of tuple is replacement subformula from P1({*:*}) in conclusion
-     mismatches= self.pattern.mismatch(formula,subformulas,bound,free,
-                                      other_errors, rule_type)
+    # premise.mismatch is what Placeholder self.pattern.mismatch would call
+     mismatches= premise.mismatch(formula,subformulas,bound,free,
+                                  other_errors, rule_type)
+     return self._check_mismatches(mismatches, subformulas, other_errors)
+
+  def _check_mismatches(self, mismatches, subformulas, other_errors):
+     'Check mismatches from self.pattern.mismatch, return invalid mismatches'
      m_mismatches = [] # invalid mismatches, nonempty indicates failure
      for source_subformula, replacement_subformula, bound in mismatches:
+      boundvs = bound_to_list(bound) # for side conditions, error message
       # sub: source_key,replacement_key are placeholders t1,s1 in Equal premise
       #  t1, s1, P1 are all keys in subformulas
       # Ae: source_key is placeholder v1 for bound variable in premise
@@ -456,16 +651,16 @@ class Subst(Symbol, Formula):
           replacement = replacement_subformula #Ae premise doesn't constrain t1
         # Check side conditions on bound variables
         for descrip, term in (('source',source), ('replacement',replacement)):
-          if list(filter(lambda v: v in bound, term.free())):
+          if any(v in boundvs for v in term.free()): # no list or lambda
             other_errors.append(
               'Fail: %s term %s includes bound variable in %s' % \
-               (descrip, term.pform(), ppflist(bound)))
+               (descrip, term.pform(), ppflist(boundvs)))
             return False
         # Check that source in premise agrees with replacement in conclusion
         if not source_subformula.equal(source) or \
             not replacement_subformula.equal(replacement):
           m_mismatches.append((source_subformula, replacement_subformula,
-                               copy(bound))) # indicate failure
+                               bound)) # indicate failure
      return m_mismatches # nonempty indicates failure
     
   def generate(self, subformulas, otherdata, other_errors):
@@ -474,6 +669,7 @@ class Subst(Symbol, Formula):
     and then substituting into those as directed by self.substititions
     """
     form = self.pattern.subst(subformulas)
+    datum = otherdata[0] if otherdata else None # term or dictionary {t1:v1}
     subst_pairs = []
     for (k,v) in self.substitutions:
       # Handle all cases right here, not in subclasses SubstAll P1 and NotIn Q1
@@ -487,19 +683,19 @@ class Subst(Symbol, Formula):
       # S1({t1:v1}) in Ei, k is term t1, v is bound variable v1
       elif k not in subformulas and v not in subformulas:
         # otherdata has already been checked in Quantifier generate 
-        k,v = list((otherdata[0].items()))[0] 
+        k,v = next(iter(datum.items())) # first pair, no list needed
         subst_pairs.append((k,v))
       # In following cases, term t1 only is from otherdata
-      elif len(otherdata) < 1 or not isinstance(otherdata[0],Term):
+      elif not isinstance(datum, Term):
         other_errors.append(
           'Fail: apply command requires argument: term or variable')
         return False
       # P1({v1:t1}) in Ae, k is bound variable v1, v is term t1
       elif k in subformulas and v not in subformulas:
-        subst_pairs.append((subformulas[k], otherdata[0]))
+        subst_pairs.append((subformulas[k], datum))
       # P1({t1:v1}) in Ai, k is term t1, v is bound variable v1
       elif k not in subformulas and v in subformulas: # Ai rule
-        subst_pairs.append((otherdata[0], subformulas[v]))
+        subst_pairs.append((datum, subformulas[v]))
     return form.subst(dict(subst_pairs))
 
 
@@ -513,49 +709,43 @@ class SubstAll(Subst, Formula):
   """
   # In P1(v1), does *not* check that v1 occurs in P1
   # SubstAll doesn't inherit any attributes from base class Subst 
-  # but it does invoke Subst.__init__ here, and repeats Subst code in mismatch
+  # but it does invoke Subst.__init__ here, and repeats some Subst code
   def __init__(self, *args):
     Subst.__init__(self, *args)
 
   # This mismatch method *does* check that *all* occurrences are substituted.
   def mismatch(self, formula, subformulas, bound,free, other_errors,rule_type):
-   # Next four lines appear in Subst and all its subclasses.
-   if self.pattern not in subformulas:
-      subformulas.update({ self.pattern : formula })
+   premise = self._premise(formula, subformulas) # as in Subst.mismatch
+   if premise is None:
       return [] # formula matches this Placeholder 
    else: 
-    # Call base class mismatch method to do most error checking
-    mismatches = Subst.mismatch(self, formula, subformulas, 
-                               bound, free, other_errors, rule_type)
-    if mismatches or other_errors:
-     return mismatches # must be error other than all occurrences not replaced
+    # self.pattern is premise P1. formula is conclusion, P1 with substitutions
+    # mismatches shows which substitutions were done
+    mismatches = premise.mismatch(formula,subformulas,bound,free,
+                                  other_errors, rule_type)
+    # Call base class method to do most error checking, as in Subst.mismatch
+    m_mismatches = self._check_mismatches(mismatches, subformulas,other_errors)
+    if m_mismatches or other_errors:
+     return m_mismatches # must be error other than all occurrences not replaced
     else:
-     # no error, must find which substitutions were done
-     # self.pattern is premise P1. formula is conclusion, P1 with substitutions
-     # mismatches shows which substitutions were done, which must be correct
-     #  otherwise Base.mismatch would have indicated error and returned, above
-     mismatches = self.pattern.mismatch(formula,subformulas,bound,free,
-                                        other_errors, rule_type)
-     if other_errors:
+     # no error, substitutions in mismatches must be correct
+     #  otherwise _check_mismatches would have indicated error, above
+     # Apply correct substitutions to all occurrences in P1 to get all_substs
+     all_substs = premise.subst({ p:f for (p,f,b) in mismatches })
+     # Compare all_substs to formula, which is the conclusion of the rule.
+     # m_mismatches will be empty iff all substitutions were performed
+     # use mismatch not equal because returned m_mismatches used in error msg
+     m_mismatches=all_substs.mismatch(formula,subformulas,bound,free,
+                                      other_errors, rule_type)
+     if m_mismatches:
+       other_errors.append(
+        'Fail: Not all occurrences substituted the same way %s' % \
+          ppfpairs([ (p,f) for (p,f,b) in mismatches ]))
+       return False
+     elif other_errors:
        return False
-     else:
-       # Apply correct substitutions to all occurrences in P1 to get all_substs
-       all_substs = \
-        subformulas[self.pattern].subst(dict([(p,f) for (p,f,b) in mismatches]))
-       # Compare all_substs to formula, which is the conclusion of the rule.
-       # m_mismatches will be empty iff all substitutions were performed
-       # use mismatch not equal because returned m_mismatches used in error msg
-       m_mismatches=all_substs.mismatch(formula,subformulas,bound,free,
-                                        other_errors, rule_type)
-       if m_mismatches:
-         other_errors.append(
-          'Fail: Not all occurrences substituted the same way %s' % \
-            ppfpairs([ (p,f) for (p,f,b) in mismatches ]))
-         return False
-       elif other_errors:
-         return False
-       else: 
-         return []
+     else: 
+       return []
 
 class NotIn(Subst, Formula):
   """
@@ -564,28 +754,27 @@ class NotIn(Subst, Formula):
    Ee : [ E(v1, P1(v1)), [Let(v2,P1({v1:v2})), Q1({v2:None})], Q1({v2:None}) ]
   """
   # NotIn doesn't inherit any attributes from base class Subst 
-  # but it does invoke Subst.__init__ here, and repeats Subst code in mismatch
+  # but it does invoke Subst.__init__ here, and Subst._premise in mismatch
   def __init__(self, *args):
     Subst.__init__(self, *args)
     
   def mismatch(self, formula, subformulas, bound,free, other_errors,rule_type):
-   # Next four lines appear in Subst and all its subclasses.
-   if self.pattern not in subformulas:
-      subformulas.update({ self.pattern : formula })
+   premise = self._premise(formula, subformulas) # as in Subst.mismatch
+   if premise is None:
       return [] # formula matches this Placeholder 
    else: 
+    fvs = premise.free()
     for v_key, v_code in self.substitutions:
       # This code doesn't use v_code at all
       # Rule looks nice with Q1({v2:None}) but this code doesn't check for None
       v = subformulas[v_key] 
-      fvs = subformulas[self.pattern].free()
       if v in fvs:
         other_errors.append(
           'Fail: variable %s appears free in formula among %s' % \
              (v.ppf(), ppflist(fvs)))
         return False
-    return subformulas[self.pattern].mismatch(formula, subformulas, bound, 
-                                              free,other_errors,rule_type)
+    return premise.mismatch(formula, subformulas, bound, 
+                            free,other_errors,rule_type)
 
 
 # utility functions
@@ -611,13 +800,43 @@ def check_type(self, arg_type, *args):
       raise TypeError('%s argument %d, %s is %s, must be %s' % \
         (self.__class__.__name__, i, a.ppf(), type(a), arg_type))
 
+def walk_free(formula):
+  'True if Compound.free walks formula, instead of calling its free method'
+  return isinstance(formula, Compound) and type(formula).free is Compound.free
+
 def remove_dups(vs):
   'Return shallow copy of list with duplicates removed'
-  vars = []
-  for v in vs:
-    if v not in vars:
-      vars.append(v)
-  return vars
+  # Not called in flip since Compound.free collects into a dict, kept as API
+  # dict keeps first-seen order. Key by id like v in list, formulas interned
+  return list({ id(v): v for v in vs }.values())
+
+def bound_to_list(bound):
+  """
+  Return list of bound variables, outermost first.  In mismatch methods
+  bound is None (for no bound variables) or a pair (variable, bound) 
+  where variable is bound in the scope of the variables in bound.
+  So extending bound in Quantifier.mismatch does not update or copy it.
+  """
+  if isinstance(bound, list): # from caller, see list_to_bound
+    return list(bound)
+  vs = []
+  while bound:
+    v, bound = bound
+    vs.append(v)
+  vs.reverse()
+  return vs
+
+def list_to_bound(bound):
+  """
+  Return bound as None or pair, see bound_to_list.  Callers of mismatch
+  outside nd might pass a list of bound variables instead, outermost first.
+  """
+  if not isinstance(bound, list):
+    return bound
+  pairs = None # no bound variables, including []
+  for v in bound:
+    pairs = (v, pairs)
+  return pairs
 
 # pretty-printing for bound/free, match/substitute lists and dictionaries
 
@@ -160,7 +160,7 @@ def check_rule(rule, premises, rule_type, otherdata):  # formula is global
   subformulas = {} # each call to match uses/updates, start w/ empty dict.
   for (form, (subproof,frule_type,pattern)) in zip(formula_etc,inference_rule):
     other_errors = [] # list of error messages (strings)
-    boundvars = [] # list of bound variables at entry to mismatch
+    boundvars = None # no bound variables at entry to mismatch, bound_to_list
     if isinstance(form, Apply): # can only occur when checking rule conclusion
       if subformulas == {}: #generate needs premises (subformulas) to work with
         return 'Fail: cannot apply %s rule, must provide formula' % prn(rule)
@@ -186,7 +186,7 @@ def add_rule_names(*rule_names):
 def add_rules(*rules):
     for rs in rules:
         logic.rules.update(rs)
-    logic.frules = dict([(n, flotten(r)) for (n,r) in logic.rules.items()])
+    logic.frules = { n: flotten(r) for (n,r) in logic.rules.items() }
 
 # used by save function
 
@@ -0,0 +1,43 @@
+from fol_session import *
+import nd # proof state, check does not print formulas
+
+# free, equal, subst walk formulas with explicit stacks, not recursion,
+# so deeply nested formulas do not hit the Python recursion limit.
+# Don't print deep formulas, ppf and pform are still recursive.
+
+depth = 3000
+
+print('Nested quantifiers, depth %d' % depth)
+aq = P(x,y)
+for i in range(depth):
+  aq = A(x, aq)
+print(ppflist(aq.free()))
+print(ppflist(aq.args[1].free())) # cached on each subformula
+aqz = aq.subst({y:z})
+print(ppflist(aqz.free()))
+print(aq.equal(aqz))
+print(aq.equal(aqz.subst({z:y})))
+print()
+
+print('Nested compounds, depth %d' % depth)
+nc = Not(P(x))
+for i in range(depth):
+  nc = Not(And(nc, Q(y)))
+print(ppflist(nc.free()))
+ncz = nc.subst({P(x):P(z)})
+print(ppflist(ncz.free()))
+print(nc.equal(ncz))
+print()
+
+print('Let and New inside a compound')
+ln = And(New(z), Let(x,P(x,y)))
+print(ln.ppf())
+print(ppflist(ln.free()))
+print()
+
+print('Proof steps with deep formulas')
+clear()
+print(check(aq, given))
+print(check(nc, given))
+print(check(And(aq, nc), ai, 0, 1))
+print(ppflist(nd.freevars[0]))
@@ -95,3 +95,27 @@ mult_occur_err_1 = \
    (And(P(u,y),Q(z,y)), sub, 1,2)]
 
 print(check_proof(mult_occur_err_1))
+
+bound_in_sibling_ok = \
+  [(Text('Variable bound in one conjunct is free in the other'),comment),
+   (And(A(x,P(x)),P(x)), given),
+   (Equal(x,y), given),
+   (And(A(x,P(x)),P(y)), sub, 2,1)]
+
+print(check_proof(bound_in_sibling_ok))
+
+premise_more_args = \
+  [(Text('Conclusion relation has fewer arguments than premise'),comment),
+   (P(a,c), given),
+   (Equal(a,b), given),
+   (P(b),sub,2,1)]
+
+print(check_proof(premise_more_args))
+
+conclusion_more_args = \
+  [(Text('Conclusion relation has more arguments than premise'),comment),
+   (P(a), given),
+   (Equal(a,b), given),
+   (P(b,c),sub,2,1)]
+
+print(check_proof(conclusion_more_args))
@@ -3,6 +3,7 @@ call plogdiff equal_sub_test
 call plogdiff equal_equiv_test
 call plogdiff simple_q_test
 call plogdiff free_test
+call plogdiff deep_test
 call plogdiff mismatch_test
 call plogdiff subproof_q_test
 call plogdiff kaye_ch9_test
@@ -1,5 +1,5 @@
 from fol_session import *
-from formula import ppfpairs
+from formula import ppfpairs, bound_to_list
 
 # a,b,c are variables in fol_session, rebind
 a,b,c = map(Letter, 'abc')
@@ -30,3 +30,13 @@ print(' to substitute into f3 to get the original f1 back')
 print('f1_ = f3.subst(... m_mismatches...)  %s' % f1_.ppf())
 print('f1_.mismatch(f1, ...)  %s' %  f1_.mismatch(f1,{},[],[],[],''))
 print('not f1_.mismatch(f1, ...)  %s' %  (not f1_.mismatch(f1,{},[],[],[],'')))
+print()
+
+print('Bound variables can be passed as a list, outermost first')
+f6 = A(y,P(x,y))
+f7 = A(y,P(z,y))
+mismatches = f6.mismatch(f7,{},[x],[],[],'')
+print('f6  %s' % f6.ppf())
+print('f7  %s' % f7.ppf())
+print('f6.mismatch(f7,...) %s' % ppfpairs([ (s,f) for (s,f,vs) in mismatches ]))
+print('bound  %s' % [ ppflist(bound_to_list(vs)) for (s,f,vs) in mismatches ])
@@ -234,3 +234,19 @@ print(ppfdict(subsm12))
 print(andm12s.pform())
 print()
 
+print("Let and New variable is substituted, like any other argument")
+lyp = Let(y,P(y))
+syz = {y:z}
+lzp = lyp.subst(syz)
+print(lyp.pform())
+print(ppfdict(syz))
+print(lzp.pform())
+print(lzp.ppf())
+print()
+ny = New(y)
+nz = ny.subst(syz)
+print(ny.pform())
+print(ppfdict(syz))
+print(nz.pform())
+print(nz.ppf())
+print()